@@ -1,29 +1,53 @@
 import argparse
 import json
 import re
-from urllib.parse import urlparse
 import os
-import requests
-from dotenv import load_dotenv
-load_dotenv() 
 import sys
-import time
-import random
 import html
-from urllib.parse import quote_plus
-import tiktoken
-
+import functools
+import itertools
+import threading
+from typing import Iterable, Optional
+from urllib.parse import quote_plus, unquote
+
+try:
+    import orjson  # optional, much faster JSON serialization and parsing
+except ImportError:
+    orjson = None
+
+# Both accept the raw bytes lines of a streamed model response
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+_URL_RE = re.compile(r"https?://[^\s)>\]]+")
+# Capitalized word, used as a cheap entity-name signal for citations
+_ENTITY_RE = re.compile(r'\b[A-Z][a-zA-Z]+\b')
+_HREF_RE = re.compile(r'href="(https?://[^"]+)"')
+_UDDG_RE = re.compile(r"[?&]uddg=([^&]+)")
+# Page patterns run on the raw bytes; fetch_snippet decodes only what it keeps
+_TITLE_RE = re.compile(rb"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+_DESC_RE = re.compile(rb'<meta[^>]+name=["\']description["\'][^>]+content=["\'](.*?)["\']', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(rb"<[^>]+>")
+_HEAD_END_RE = re.compile(rb"</head\s*>", re.IGNORECASE)
+_WS_RE = re.compile(r"\s+")
+# Scheme, optional userinfo, then the host up to the port, path, query or fragment
+_HOST_RE = re.compile(r"^https?://(?:[^@/?#]*@)?([^/:?#]*)", re.IGNORECASE)
+# Trailing punctuation that is part of the sentence, not the URL
+_TRAIL = ".,;:!?"
+
+# extract_urls, is_owned and partition_owned are the public single-purpose
+# helpers; main goes through extract_all and _partition_owned_with_host.
 def extract_urls(text: str) -> list[str]:
     """
     Return all http(s) URLs in reading order, with common trailing punctuation removed. 
     """
-    raw = re.findall(r"https?://[^\s)>\]]+", text)
-    cleaned = [u.rstrip(".,;:!?") for u in raw ]
-    seen = {}
-    for u in cleaned:
+    seen = set()
+    urls = []
+    for u in _URL_RE.findall(text):
+        u = u.rstrip(_TRAIL)
         if u not in seen:
-            seen[u] = True
-    return list(seen.keys())
+            seen.add(u)
+            urls.append(u)
+    return urls
 
 def extract_citations(text: str) -> list[str]:
     lines = text.split('\n')
@@ -31,13 +55,13 @@ def extract_citations(text: str) -> list[str]:
     seen = set()
     
     for line in lines:
-        urls = re.findall(r"https?://[^\s)>\]]+", line)
+        urls = _URL_RE.findall(line)
         if not urls:
             continue
             
-        cleaned_urls = [u.rstrip(".,;:!?") for u in urls]
+        cleaned_urls = [u.rstrip(_TRAIL) for u in urls]
         
-        words = re.findall(r'\b[A-Z][a-zA-Z]+\b', line)
+        words = _ENTITY_RE.findall(line)
         
         if words:
             for u in cleaned_urls:
@@ -47,18 +71,20 @@ def extract_citations(text: str) -> list[str]:
     
     return citations
 
+@functools.lru_cache(maxsize=256)
 def host_of(url: str) -> str:
     """
     Return the lowercased hostname of a URL, or empty string on failure.
     """
-    try:
-        host = urlparse(url).netloc.strip().lower()
-        # Remove leading 'www.' to normalize common patterns
-        if host.startswith("www."):
-            host = host[4:]
-        return host.lstrip(".")
-    except Exception:
+    # One anchored match instead of urlparse: only the host is needed
+    m = _HOST_RE.match(url)
+    if not m:
         return ""
+    host = m.group(1).lower()
+    # Remove leading 'www.' to normalize common patterns
+    if host[:4] == "www.":
+        host = host[4:]
+    return host.lstrip(".")
     
 def is_owned(host: str, brand_host: str) -> bool:
     """
@@ -70,61 +96,154 @@ def is_owned(host: str, brand_host: str) -> bool:
     if host == brand_host:
         return True
     return host.endswith("." + brand_host)
-    
 
-
-def partition_owned(urls: list[str], brand_site_url: str) -> tuple[list[str], list[str]]:
+def partition_owned(urls: Iterable[str], brand_site_url: str) -> tuple[list[str], list[str]]:
     """
     Split URLs into owned vs external using host equality or subdomain checks.
+    De-duplicates while preserving order.
+    """
+    return _partition_owned_with_host(urls, host_of(brand_site_url))
+
+def _partition_owned_with_host(urls: Iterable[str], brand_host: str) -> tuple[list[str], list[str]]:
+    """
+    partition_owned for a brand host the caller has already parsed.
     """
-    brand_host = host_of(brand_site_url)
     owned: list[str] = []
     external: list[str] = []
+    seen = set()
     for u in urls:
-        h = host_of(u)
-        if is_owned(h, brand_host):
+        if u in seen:
+            continue
+        seen.add(u)
+        if is_owned(host_of(u), brand_host):
             owned.append(u)
         else:
             external.append(u)
-    # De-duplicate while preserving order
-    owned = list(dict.fromkeys(owned))
-    external = list(dict.fromkeys(external))
     return owned, external
 
 
-def parse_args() -> argparse.Namespace:
+# (flag, add_argument kwargs) for every CLI option, in --help order
+_ARGS = (
+    ("--brand", {"required": True, "help": "Brand name."}),
+    ("--url", {"required": True, "help": "Brand's website URL."}),
+    ("--question", {"required": True, "help": "End-user question."}),
+    ("--max-searches", {"type": int, "default": 0, "help": "Hard cap on web searches to perform."}),
+    ("--max-sources", {"type": int, "default": 0, "help": "Hard cap on sources to include."}),
+    ("--use-model", {"type": int, "default": 0, "help": "1 to call the model, 0 to use placeholder."}),
+    ("--model", {"default": "gpt-4o", "help": "Model name to use if --use-model=1."}),
+    ("--output", {"help": "If set, write the JSON to this file path."}),
+    ("--debug", {"action": "store_true", "help": "Print errors to stderr."}),
+    ("--retries", {"type": int, "default": 2, "help": "Retries on 429/5xx."}),
+    ("--timeout", {"type": int, "default": 30, "help": "HTTP timeout seconds."}),
+    ("--provider", {"choices": ["ollama", "openai"], "default": "ollama",
+                    "help": "Model provider: local Ollama (default) or OpenAI."}),
+    ("--ollama-model", {"default": "llama3.2", "help": "Ollama model name to use when --provider=ollama."}),
+    ("--ground", {"type": int, "default": 0, "help": "1 to ground the answer with web snippets."}),
+    ("--search-query", {"default": None, "help": "Override the auto search query."}),
+    ("--snippet-chars", {"type": int, "default": 600, "help": "Max characters per snippet."}),
+    ("--fetch-bytes", {"type": int, "default": 65536, "help": "Max bytes downloaded per source page."}),
+    ("--must-link-site", {"action": "store_true",
+                          "help": "If set, ensure the brand URL appears once in the final answer."}),
+    ("--compact-prompt", {"type": int, "default": 1,
+                          "help": "1 to use compact instructions to save tokens; 0 for verbose."}),
+)
+
+# Pre-rendered `--help` output so help does not pay for building the parser.
+# Keep in sync with _ARGS; after changing options, check with
+#   COLUMNS=80 python -c "import app; p = app._build_parser(); p.prog = 'app.py'; assert p.format_help() == app._USAGE"
+_USAGE = """\
+usage: app.py [-h] --brand BRAND --url URL --question QUESTION
+              [--max-searches MAX_SEARCHES] [--max-sources MAX_SOURCES]
+              [--use-model USE_MODEL] [--model MODEL] [--output OUTPUT]
+              [--debug] [--retries RETRIES] [--timeout TIMEOUT]
+              [--provider {ollama,openai}] [--ollama-model OLLAMA_MODEL]
+              [--ground GROUND] [--search-query SEARCH_QUERY]
+              [--snippet-chars SNIPPET_CHARS] [--fetch-bytes FETCH_BYTES]
+              [--must-link-site] [--compact-prompt COMPACT_PROMPT]
+
+Minimal CLI that prints a single JSON payload.
+
+options:
+  -h, --help            show this help message and exit
+  --brand BRAND         Brand name.
+  --url URL             Brand's website URL.
+  --question QUESTION   End-user question.
+  --max-searches MAX_SEARCHES
+                        Hard cap on web searches to perform.
+  --max-sources MAX_SOURCES
+                        Hard cap on sources to include.
+  --use-model USE_MODEL
+                        1 to call the model, 0 to use placeholder.
+  --model MODEL         Model name to use if --use-model=1.
+  --output OUTPUT       If set, write the JSON to this file path.
+  --debug               Print errors to stderr.
+  --retries RETRIES     Retries on 429/5xx.
+  --timeout TIMEOUT     HTTP timeout seconds.
+  --provider {ollama,openai}
+                        Model provider: local Ollama (default) or OpenAI.
+  --ollama-model OLLAMA_MODEL
+                        Ollama model name to use when --provider=ollama.
+  --ground GROUND       1 to ground the answer with web snippets.
+  --search-query SEARCH_QUERY
+                        Override the auto search query.
+  --snippet-chars SNIPPET_CHARS
+                        Max characters per snippet.
+  --fetch-bytes FETCH_BYTES
+                        Max bytes downloaded per source page.
+  --must-link-site      If set, ensure the brand URL appears once in the final
+                        answer.
+  --compact-prompt COMPACT_PROMPT
+                        1 to use compact instructions to save tokens; 0 for
+                        verbose.
+"""
+if sys.version_info < (3, 10):
+    # argparse titled this section "optional arguments" before 3.10
+    _USAGE = _USAGE.replace("\noptions:\n", "\noptional arguments:\n", 1)
+
+def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Minimal CLI that prints a single JSON payload.")
-    parser.add_argument("--brand", required=True, help="Brand name.")
-    parser.add_argument("--url", required=True, help="Brand's website URL.")
-    parser.add_argument("--question", required=True, help="End-user question.")
-    parser.add_argument("--max-searches", type=int, default=0, help="Hard cap on web searches to perform.")
-    parser.add_argument("--max-sources", type=int, default=0, help="Hard cap on sources to include.")
-    
-    parser.add_argument("--use-model", type=int, default=0, help="1 to call the model, 0 to use placeholder.")
-    parser.add_argument("--model", default="gpt-4o", help="Model name to use if --use-model=1.")
-    parser.add_argument("--output", help="If set, write the JSON to this file path.")
-    parser.add_argument("--debug", action="store_true", help="Print errors to stderr.")
-    parser.add_argument("--retries", type=int, default=2, help="Retries on 429/5xx.")
-    parser.add_argument("--timeout", type=int, default=30, help="HTTP timeout seconds.")
-    parser.add_argument("--provider", choices=["ollama", "openai"], default="ollama", help="Model provider: local Ollama (default) or OpenAI.") 
-    parser.add_argument("--ollama-model", default="llama3.2", help="Ollama model name to use when --provider=ollama.")
-    parser.add_argument("--ground", type=int, default=0, help="1 to ground the answer with web snippets.")
-    parser.add_argument("--search-query", default=None, help="Override the auto search query.")
-    parser.add_argument("--snippet-chars", type=int, default=600, help="Max characters per snippet.")
-    parser.add_argument("--must-link-site", action="store_true", help="If set, ensure the brand URL appears once in the final answer.")
-    parser.add_argument("--compact-prompt", type=int, default=1, help="1 to use compact instructions to save tokens; 0 for verbose.")
-
-    return parser.parse_args()
+    for name, kwargs in _ARGS:
+        parser.add_argument(name, **kwargs)
+    return parser
+
+def parse_args() -> argparse.Namespace:
+    if len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help"):
+        sys.stdout.write(_USAGE)
+        sys.exit(0)
+    return _build_parser().parse_args()
+
+_HUMAN_TEMPLATE = (
+    "Here is a quick answer about {brand}.\n\n"
+    "For details, see the official site: {url}\n"
+    "You might also compare third-party perspectives at https://example.org/review.\n"
+)
 
 def make_human_answer(brand: str, url: str, question: str) -> str:
     """
     Return a short, user-facing answer string for early testing.
     """
-    return (
-        f"Here is a quick answer about {brand}.\n\n"
-        f"For details, see the official site: {url}\n"
-        f"You might also compare third-party perspectives at https://example.org/review.\n"
-    )
+    return _HUMAN_TEMPLATE.format(brand=brand, url=url)
+
+_PLACEHOLDER_REVIEW_URL = "https://example.org/review"
+# Brand names that cannot match across the template text around them
+_PLAIN_BRAND_RE = re.compile(r"\w+(?: \w+)*")
+
+def placeholder_extraction(brand: str, url: str) -> Optional[tuple[list[str], list[str], list[str]]]:
+    """
+    Return (citations, mentions, answer_urls) for make_human_answer(brand, url)
+    without scanning it, or None when the inputs are unusual enough that the
+    regular extraction has to run (e.g. the brand also occurs in the URL).
+    """
+    if not (_URL_RE.fullmatch(url) and url[-1] not in _TRAIL and url != _PLACEHOLDER_REVIEW_URL):
+        return None
+    if not _PLAIN_BRAND_RE.fullmatch(brand) or brand in url or brand in _HUMAN_TEMPLATE:
+        return None
+    urls = [url, _PLACEHOLDER_REVIEW_URL]
+    return urls, [brand], urls[:]
+
+@functools.lru_cache(maxsize=32)
+def _mention_re(brand: str) -> re.Pattern:
+    return re.compile(r"\b" + re.escape(brand) + r"\b")
 
 def extract_mentions(text: str, brand: str) -> list[str]:
     """
@@ -133,11 +252,187 @@ def extract_mentions(text: str, brand: str) -> list[str]:
     """
     if not brand:
         return []
-    pattern = r"\b" + re.escape(brand) + r"\b"
-    return re.findall(pattern, text)
+    return _mention_re(brand).findall(text)
+
+# Characters that end a URL match; a brand containing one of them (or "http")
+# could overlap a URL boundary, which a single alternation scan cannot report.
+_URL_BOUNDARY_RE = re.compile(r"http|[\s)>\]]")
 
-import time
-import random
+@functools.lru_cache(maxsize=32)
+def _scan_re(brand: str) -> re.Pattern:
+    return re.compile(rf"(?P<url>{_URL_RE.pattern})|(?P<brand>\b{re.escape(brand)}\b)")
+
+def extract_all(text: str, brand: str, brand_host: str,
+                extra_urls: Iterable[str] = ()) -> tuple[list[str], list[str], list[str], list[str]]:
+    """
+    Return (citations, mentions, owned, external) for an answer in one scan of
+    the text. Same results as extract_citations, extract_mentions, and
+    partition_owned over the answer's extract_urls followed by extra_urls
+    (e.g. grounded context URLs).
+    """
+    if not brand or _URL_BOUNDARY_RE.search(brand):
+        raw_urls = _URL_RE.findall(text)
+        mentions = extract_mentions(text, brand)
+        citations = extract_citations(text)
+    else:
+        mention_re = _mention_re(brand)
+        raw_urls: list[str] = []
+        mentions: list[str] = []
+        cited: list[str] = []
+        line_end = -1
+        line_has_entity = False
+        for m in _scan_re(brand).finditer(text):
+            if m.lastgroup != "url":
+                mentions.append(m.group())
+                continue
+            raw_urls.append(m.group())
+            # Brand occurrences inside a URL are picked up by re-checking just that span
+            mentions.extend(mention_re.findall(text, m.start(), m.end()))
+            # Citation rule from extract_citations: URL on a line with a capitalized word
+            if m.start() > line_end:
+                line_start = text.rfind("\n", 0, m.start()) + 1
+                line_end = text.find("\n", m.end())
+                if line_end < 0:
+                    line_end = len(text)
+                line_has_entity = _ENTITY_RE.search(text, line_start, line_end) is not None
+            if line_has_entity:
+                cited.append(m.group().rstrip(_TRAIL))
+        citations = list(dict.fromkeys(cited))
+
+    owned, external = _partition_owned_with_host(
+        itertools.chain((u.rstrip(_TRAIL) for u in raw_urls), extra_urls), brand_host
+    )
+    return citations, mentions, owned, external
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+def _get_session():
+    """
+    Return the process-wide requests.Session used for every HTTP call, so
+    searches, snippet fetches and model retries reuse pooled keep-alive
+    connections instead of a new TCP/TLS handshake per request.
+    """
+    global _SESSION
+    if _SESSION is None:
+        # Snippet fetches run on worker threads; build the session only once
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _SESSION = session
+    return _SESSION
+
+# Retry sleeps in seconds: 0.5, 1, 2 (then 2 for any further attempts)
+_BACKOFF = (0.5, 1.0, 2.0)
+
+@functools.lru_cache(maxsize=None)
+def _bounded_retry_cls():
+    """
+    urllib3 Retry subclass that sleeps on the _BACKOFF schedule (or for the
+    server's Retry-After) but never past its deadline, and gives up once the
+    deadline has passed. Built lazily so urllib3 loads only with requests.
+    """
+    import random
+    import time
+    from urllib3.util.retry import Retry
+
+    class BoundedRetry(Retry):
+        deadline = float("inf")
+
+        def new(self, **kw):
+            retry = super().new(**kw)
+            retry.deadline = self.deadline
+            return retry
+
+        def is_exhausted(self):
+            return super().is_exhausted() or time.monotonic() >= self.deadline
+
+        def get_backoff_time(self):
+            # Exponential backoff with jitter, starting before the first retry
+            attempt = len(self.history)
+            if not attempt:
+                return 0
+            return _BACKOFF[min(attempt, len(_BACKOFF)) - 1] + random.random() * 0.1
+
+        def sleep(self, response=None):
+            delay = None
+            if response is not None and self.respect_retry_after_header:
+                delay = self.get_retry_after(response)
+            if delay is None:
+                delay = self.get_backoff_time()
+            remaining = self.deadline - time.monotonic()
+            if delay > 0 and remaining > 0:
+                time.sleep(min(delay, remaining))
+
+    return BoundedRetry
+
+def _retry_adapter(retries: int, statuses: tuple[int, ...], timeout: float):
+    """
+    HTTPAdapter whose urllib3 Retry re-sends a POST on the given statuses with
+    backoff, honouring Retry-After. Connection and read errors are not
+    retried, so a down server or a slow model still fails fast.
+    """
+    import time
+    from requests.adapters import HTTPAdapter
+
+    retry = _bounded_retry_cls()(
+        total=max(0, retries),
+        connect=0,
+        read=0,
+        status_forcelist=statuses,
+        allowed_methods=frozenset({"POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    # Bound total wall time so a persistent 429 cannot stall far past --timeout
+    retry.deadline = time.monotonic() + timeout * (max(0, retries) + 1)
+    return HTTPAdapter(max_retries=retry)
+
+def _iter_openai_stream(resp):
+    """
+    Yield content deltas from an OpenAI chat completion SSE stream
+    ("data: {...}" lines ending with "data: [DONE]").
+    """
+    for line in resp.iter_lines():
+        if not line.startswith(b"data: "):
+            continue
+        data = line[6:]
+        if data == b"[DONE]":
+            break
+        for choice in _json_loads(data).get("choices") or ():
+            piece = (choice.get("delta") or {}).get("content")
+            if piece:
+                yield piece
+
+def _iter_ollama_stream(resp):
+    """
+    Yield "response" fragments from Ollama's newline-delimited JSON stream.
+    """
+    for line in resp.iter_lines():
+        if not line:
+            continue
+        chunk = _json_loads(line)
+        if chunk.get("error"):
+            raise RuntimeError(f"Ollama error: {chunk['error']}")
+        piece = chunk.get("response")
+        if piece:
+            yield piece
+        if chunk.get("done"):
+            break
+
+_OPENAI_ENDPOINT = "https://api.openai.com/v1/chat/completions"
+_OPENAI_HEADERS = {"Content-Type": "application/json"}
+_OPENAI_RETRY_STATUSES = (429, 500, 502, 503, 504)
+_SYS_COMPACT = "You are helpful. Answer in concise markdown."
+_SYS_VERBOSE = ("You are a helpful assistant. Write a concise, user-facing answer in markdown. "
+                "Do not include prompts, system messages, or developer notes. "
+                "If you include links, keep them natural.")
 
 def call_model_answer(brand: str, url: str, question: str, model: str,
                       timeout: int = 30, retries: int = 2, context: str = "", compact: bool = True) -> tuple[str, int, int]:
@@ -148,15 +443,8 @@ def call_model_answer(brand: str, url: str, question: str, model: str,
     if not api_key:
         raise RuntimeError("Missing OPENAI_API_KEY environment variable")
 
-    endpoint = "https://api.openai.com/v1/chat/completions"
-
-
-    if compact:
-        system_msg = "You are helpful. Answer in concise markdown."
-    else:
-        system_msg = ("You are a helpful assistant. Write a concise, user-facing answer in markdown. "
-                    "Do not include prompts, system messages, or developer notes. "
-                    "If you include links, keep them natural.")
+    endpoint = _OPENAI_ENDPOINT
+    system_msg = _SYS_COMPACT if compact else _SYS_VERBOSE
 
     context_block = f"Context from sources:\n---\n{context}\n---\n" if context else ""
     user_msg = (
@@ -174,33 +462,28 @@ def call_model_answer(brand: str, url: str, question: str, model: str,
             {"role": "user", "content": user_msg},
         ],
         "temperature": 0.3,
+        "stream": True,
     }
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
-
-    attempt = 0
-    while True:
-        attempt += 1
-        resp = requests.post(endpoint, headers=headers, json=payload, timeout=timeout)
-        if resp.status_code in (429, 500, 502, 503, 504):
-            if attempt > max(0, retries):
-                resp.raise_for_status()
-            # Exponential backoff with jitter: 0.5, 1, 2 sec (plus a tiny random)
-            sleep_s = min(2.0, 0.5 * (2 ** (attempt - 1))) + random.random() * 0.1
-            time.sleep(sleep_s)
-            continue
+    headers = {**_OPENAI_HEADERS, "Authorization": f"Bearer {api_key}"}
 
+    # Retries on 429/5xx happen inside urllib3 via the adapter mounted for this endpoint
+    session = _get_session()
+    session.mount(endpoint, _retry_adapter(retries, _OPENAI_RETRY_STATUSES, timeout))
+    with session.post(endpoint, headers=headers, json=payload, timeout=timeout, stream=True) as resp:
         resp.raise_for_status()
-        data = resp.json()
-        content = data["choices"][0]["message"]["content"]
-        if not isinstance(content, str) or not content.strip():
-            raise RuntimeError("Model returned empty content")
-        content = content.strip()
-        input_tokens = count_tokens(system_msg + user_msg, model)
-        output_tokens = count_tokens(content, model)
-        return content, input_tokens, output_tokens
+        content = "".join(_iter_openai_stream(resp))
+    if not isinstance(content, str) or not content.strip():
+        raise RuntimeError("Model returned empty content")
+    content = content.strip()
+    input_tokens = count_tokens(system_msg + user_msg, model)
+    output_tokens = count_tokens(content, model)
+    return content, input_tokens, output_tokens
+
+_OLLAMA_ENDPOINT = "http://localhost:11434/api/generate"
+_OLLAMA_RETRY_STATUSES = (500, 502, 503, 504)
+_OLLAMA_LEAD_COMPACT = "Answer concisely in markdown."
+_OLLAMA_LEAD_VERBOSE = ("You are a helpful assistant. Write a concise, user-facing answer in markdown. "
+                        "Do not include system prompts or developer notes.")
 
 def call_ollama_answer(brand: str, url: str, question: str, model: str,
                        timeout: int = 30, retries: int = 2, context: str = "", compact: bool = True) -> tuple[str, int, int]:
@@ -208,14 +491,10 @@ def call_ollama_answer(brand: str, url: str, question: str, model: str,
     Call a local Ollama model and return a concise, user-facing markdown answer.
     Uses the /api/generate endpoint for a simple prompt. No API key required.
     """
-    endpoint = "http://localhost:11434/api/generate"
+    endpoint = _OLLAMA_ENDPOINT
 
     context_block = f"Context from sources:\n---\n{context}\n---\n" if context else ""
-    if compact:
-        lead = "Answer concisely in markdown."
-    else:
-        lead = ("You are a helpful assistant. Write a concise, user-facing answer in markdown. "
-                "Do not include system prompts or developer notes.")
+    lead = _OLLAMA_LEAD_COMPACT if compact else _OLLAMA_LEAD_VERBOSE
     prompt = (
         f"{lead}\n"
         f"{context_block}"
@@ -225,35 +504,28 @@ def call_ollama_answer(brand: str, url: str, question: str, model: str,
         "If the context is insufficient, stay high-level and avoid invented details.\n"
     )
 
-
     payload = {
         "model": model,
         "prompt": prompt,
-        "stream": False,
+        "stream": True,
         "options": {"temperature": 0.0},
     }
 
-    attempt = 0
-    while True:
-        attempt += 1
-        resp = requests.post(endpoint, json=payload, timeout=timeout)
-        # Ollama returns 200 on success; on failure, raise
-        if resp.status_code in (500, 502, 503, 504):
-            if attempt > max(0, retries):
-                resp.raise_for_status()
-            sleep_s = min(2.0, 0.5 * (2 ** (attempt - 1))) + random.random() * 0.1
-            time.sleep(sleep_s)
-            continue
-
+    session = _get_session()
+    session.mount(endpoint, _retry_adapter(retries, _OLLAMA_RETRY_STATUSES, timeout))
+    # Ollama returns 200 on success; on failure (after retries), raise
+    with session.post(endpoint, json=payload, timeout=timeout, stream=True) as resp:
         resp.raise_for_status()
-        data = resp.json()
-        content = data.get("response", "")
-        if not isinstance(content, str) or not content.strip():
-            raise RuntimeError("Ollama returned empty content")
-        content = content.strip()
-        input_tokens = count_tokens(prompt, "gpt-4o")
-        output_tokens = count_tokens(content, "gpt-4o")
-        return content, input_tokens, output_tokens
+        content = "".join(_iter_ollama_stream(resp))
+    if not isinstance(content, str) or not content.strip():
+        raise RuntimeError("Ollama returned empty content")
+    content = content.strip()
+    input_tokens = count_tokens(prompt, "gpt-4o")
+    output_tokens = count_tokens(content, "gpt-4o")
+    return content, input_tokens, output_tokens
+
+# Headers for search and page fetches; requests merges them without mutating this dict
+_UA = {"User-Agent": "curl/8"}
 
 def ddg_search(query: str, timeout: int = 15) -> list[str]:
     """
@@ -263,33 +535,29 @@ def ddg_search(query: str, timeout: int = 15) -> list[str]:
     - De-duplicates while preserving order
     """
     url = "https://duckduckgo.com/html/?q=" + quote_plus(query)
-    headers = {"User-Agent": "curl/8"}
-    resp = requests.get(url, headers=headers, timeout=timeout)
+    resp = _get_session().get(url, headers=_UA, timeout=timeout)
     resp.raise_for_status()
     text = resp.text
 
     # Collect all hrefs (simple approach)
-    candidates = re.findall(r'href="(https?://[^"]+)"', text)
+    candidates = _HREF_RE.findall(text)
 
     cleaned = []
     seen = set()
     for u in candidates:
         # If it is a DDG redirect like .../l/?uddg=ENCODED, extract target
-        if "duckduckgo.com/l/?" in u or "duckduckgo.com/l/?".replace("/", "%2F") in u:
-            m = re.search(r"[?&]uddg=([^&]+)", u)
+        # (any DDG host: duckduckgo.com, html., lite., ...)
+        if "duckduckgo.com/l/?" in u:
+            m = _UDDG_RE.search(u)
             if m:
-                try:
-                    target = requests.utils.unquote(m.group(1))
-                    u = target
-                except Exception:
-                    pass
+                u = unquote(m.group(1))
 
-        # Drop any duckduckgo.com host links
-        if host_of(u).endswith("duckduckgo.com"):
+        # Keep only real http(s) links (cheap prefix test before parsing the host)
+        if not u.startswith(("http://", "https://")):
             continue
 
-        # Keep only real http(s) links
-        if not u.startswith("http://") and not u.startswith("https://"):
+        # Drop any duckduckgo.com host links
+        if host_of(u).endswith("duckduckgo.com"):
             continue
 
         if u not in seen:
@@ -298,50 +566,129 @@ def ddg_search(query: str, timeout: int = 15) -> list[str]:
 
     return cleaned[:10]
 
-def count_tokens(text: str, model: str = "gpt-4o") -> int:
+_ENCODING_LOCK = threading.Lock()
+
+def _get_encoding(model: str):
+    # lru_cache does not serialize misses; the lock makes count_tokens wait for
+    # the in-flight warm-up load instead of loading the BPE ranks a second time
+    with _ENCODING_LOCK:
+        return _load_encoding(model)
+
+@functools.lru_cache(maxsize=8)
+def _load_encoding(model: str):
+    import tiktoken
+
     try:
-        enc = tiktoken.encoding_for_model(model)
+        return tiktoken.encoding_for_model(model)
     except KeyError:
-        enc = tiktoken.get_encoding("cl100k_base")
-    return len(enc.encode(text))
+        return tiktoken.get_encoding("cl100k_base")
+
+def _warm_encoding(model: str) -> None:
+    """
+    Load the tokenizer in the background; count_tokens retries on failure.
+    """
+    try:
+        _get_encoding(model)
+    except Exception:
+        pass
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    return len(_get_encoding(model).encode(text))
 
-def fetch_snippet(source_url: str, max_chars: int = 600, timeout: int = 15) -> str:
+def _body_text(raw: bytes, max_chars: int, encoding: str) -> str:
+    """
+    Return the first max_chars of the page text: tags removed, entities
+    unescaped, whitespace collapsed. Reads only as much of the document as
+    needed instead of stripping the whole page, and decodes only that part.
+    """
+    def clean(parts: list[bytes]) -> str:
+        # Tags are replaced by a single space, as _TAG_RE.sub(b" ", ...) would
+        text = b" ".join(parts).decode(encoding, errors="replace")
+        return _WS_RE.sub(" ", html.unescape(text)).strip()
+
+    parts = []
+    pos = 0
+    size = 0
+    # Counted in bytes, which is never less than the decoded length
+    budget = max(2 * max_chars, 256)
+    for m in _TAG_RE.finditer(raw):
+        parts.append(raw[pos:m.start()])
+        size += m.start() - pos
+        pos = m.end()
+        if size >= budget:
+            # Unescaping and collapsing only shrink text, so check before stopping
+            text = clean(parts)
+            if len(text) >= max_chars:
+                return text[:max_chars]
+            budget *= 2
+    parts.append(raw[pos:])
+    return clean(parts)[:max_chars]
+
+def fetch_snippet(source_url: str, max_chars: int = 600, timeout: int = 15, max_bytes: int = 65536) -> str:
     """
     Fetch the page and return a compact snippet.
     Token optimization tactic: strip tags, collapse whitespace, hard length cap.
+    Only the first max_bytes of the page are downloaded.
     """
-    headers = {"User-Agent": "curl/8"}
-    r = requests.get(source_url, headers=headers, timeout=timeout)
-    r.raise_for_status()
-    html_text = r.text
+    with _get_session().get(source_url, headers=_UA, timeout=timeout, stream=True) as r:
+        r.raise_for_status()
+        chunks = []
+        size = 0
+        for chunk in r.iter_content(chunk_size=16384):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                break
+        encoding = r.encoding or "utf-8"
+    raw = b"".join(chunks)[:max_bytes]
+    try:
+        ascii_compatible = "<".encode(encoding) == b"<"
+    except LookupError:
+        encoding, ascii_compatible = "utf-8", True
+    if not ascii_compatible:
+        # e.g. UTF-16: the byte patterns need an ASCII-compatible encoding
+        raw = raw.decode(encoding, errors="replace").encode("utf-8")
+        encoding = "utf-8"
+
+    # extract <title> and meta description if present; both live in <head>
+    m = _HEAD_END_RE.search(raw)
+    head = raw[:m.start()] if m else raw
 
-    # extract <title> and meta description if present
     title = ""
-    m = re.search(r"<title[^>]*>(.*?)</title>", html_text, flags=re.IGNORECASE | re.DOTALL)
+    m = _TITLE_RE.search(head)
     if m:
-        title = html.unescape(m.group(1)).strip()
+        title = html.unescape(m.group(1).decode(encoding, errors="replace")).strip()
 
     desc = ""
-    m = re.search(r'<meta[^>]+name=["\']description["\'][^>]+content=["\'](.*?)["\']', html_text, flags=re.IGNORECASE | re.DOTALL)
+    m = _DESC_RE.search(head)
     if m:
-        desc = html.unescape(m.group(1)).strip()
-
-    # crude text fallback: remove tags and collapse whitespace
-    text_only = re.sub(r"<[^>]+>", " ", html_text)
-    text_only = re.sub(r"\s+", " ", html.unescape(text_only)).strip()
+        desc = html.unescape(m.group(1).decode(encoding, errors="replace")).strip()
 
     parts = []
     if title:
         parts.append(f"TITLE: {title}")
     if desc:
         parts.append(f"DESCRIPTION: {desc}")
-    if not desc and text_only:
-        parts.append(f"BODY: {text_only[:max_chars]}")
+    else:
+        # crude text fallback, only needed without a description
+        text_only = _body_text(raw, max_chars, encoding)
+        if text_only:
+            parts.append(f"BODY: {text_only}")
 
     snippet = " ".join(parts)
     snippet = snippet[:max_chars]  # enforce hard cap
     return snippet
 
+def _safe_fetch(source_url: str, max_chars: int, timeout: int, max_bytes: int) -> str:
+    """
+    fetch_snippet that returns "" instead of raising, so one bad source
+    does not sink the others.
+    """
+    try:
+        return fetch_snippet(source_url, max_chars=max_chars, timeout=timeout, max_bytes=max_bytes)
+    except Exception:
+        return ""
+
 def build_context(snippets: list[tuple[str, str]]) -> str:
     """
     Join (url, snippet) pairs into a compact context block.
@@ -352,8 +699,25 @@ def build_context(snippets: list[tuple[str, str]]) -> str:
         lines.append(f"- {url}\n  {snip}")
     return "\n".join(lines)
 
+def dump_json(payload: dict, pretty: bool = True) -> bytes:
+    """
+    Serialize the output payload to UTF-8 JSON bytes, using orjson when installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(payload, indent=2).encode("utf-8")
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
 def main() -> None:
     args = parse_args()
+    if args.use_model:
+        # Only the model path reads .env (OPENAI_API_KEY); skip the import otherwise.
+        from dotenv import load_dotenv
+        load_dotenv()
+        # Loading the BPE ranks is slow; overlap it with the search and model requests
+        token_model = args.model if args.provider == "openai" else "gpt-4o"
+        threading.Thread(target=_warm_encoding, args=(token_model,), daemon=True).start()
     searches_used = 0
     sources_used = 0
     context_text = ""
@@ -361,6 +725,8 @@ def main() -> None:
     chosen = []
     input_tokens = 0
     output_tokens = 0
+    # Parsed once; shared by the grounding filter and the final partition
+    brand_host = host_of(args.url)
 
 
     # Grounding pipeline guarded by budgets
@@ -373,17 +739,7 @@ def main() -> None:
 
         # Prefer brand-owned URLs first when we have results
         if results:
-            brand_host = host_of(args.url)
-            owned_first, external_next = [], []
-            seen = set()
-            for u in results:
-                if u in seen:
-                    continue
-                seen.add(u)
-                if is_owned(host_of(u), brand_host):
-                    owned_first.append(u)
-                else:
-                    external_next.append(u)
+            owned_first, external_next = _partition_owned_with_host(results, brand_host)
             ordered = owned_first + external_next
             chosen = ordered[: args.max_sources]
         else:
@@ -391,15 +747,17 @@ def main() -> None:
             if args.max_sources > 0 and args.url:
                 chosen = [args.url]
 
-        # fetch trimmed snippets for chosen URLs
+        # fetch trimmed snippets for chosen URLs in parallel; results keep their order
         pairs = []
-        for u in chosen:
-            try:
-                sn = fetch_snippet(u, max_chars=args.snippet_chars, timeout=args.timeout)
-            except Exception:
-                continue
-            if sn:
-                pairs.append((u, sn))
+        if chosen:
+            from concurrent.futures import ThreadPoolExecutor
+
+            def fetch(u: str) -> str:
+                return _safe_fetch(u, args.snippet_chars, args.timeout, args.fetch_bytes)
+
+            with ThreadPoolExecutor(max_workers=min(8, len(chosen))) as ex:
+                snippets = list(ex.map(fetch, chosen))
+            pairs = [(u, sn) for u, sn in zip(chosen, snippets) if sn]
 
         context_urls = [u for (u, _snip) in pairs]
         sources_used = len(pairs)
@@ -409,6 +767,7 @@ def main() -> None:
 
 
     use_compact = bool(args.compact_prompt)
+    placeholder = False
 
     if args.use_model:
         try:
@@ -429,24 +788,28 @@ def main() -> None:
                 print(f"[model-error] {e}", file=sys.stderr)
             human_text = make_human_answer(args.brand, args.url, args.question)
             model_name = f"{args.provider} (fallback: placeholder)"
+            placeholder = True
     else:
         human_text = make_human_answer(args.brand, args.url, args.question)
         model_name = "placeholder"
+        placeholder = True
 
 
     if args.must_link_site and args.url and args.url not in human_text:
         human_text = human_text.rstrip() + f"\n\nFor details, see {args.url}\n"
 
-    mentions = extract_mentions(human_text, args.brand)
-
-    # URLs that appear in the final answer only
-    citations = extract_citations(human_text)
-
-    # Everything used to form the answer: answer links plus grounded context URLs
-    answer_urls = extract_urls(human_text)
-    used_urls = list(dict.fromkeys(answer_urls + context_urls))
-
-    owned, external = partition_owned(used_urls, args.url)
+    # The placeholder answer is a known template; skip scanning it when possible
+    known = placeholder_extraction(args.brand, args.url) if placeholder else None
+    if known is not None:
+        citations, mentions, answer_urls = known
+        # partition_owned de-duplicates with a seen set; no concatenated copy needed
+        owned, external = _partition_owned_with_host(itertools.chain(answer_urls, context_urls), brand_host)
+    else:
+        # citations: URLs that appear in the final answer only
+        # owned/external: answer links plus grounded context URLs
+        citations, mentions, owned, external = extract_all(
+            human_text, args.brand, brand_host, context_urls
+        )
 
 
 
@@ -468,13 +831,16 @@ def main() -> None:
             },
         }
     }
-    blob = json.dumps(payload, indent=2)
     if args.output:
-        with open(args.output, "w", encoding="utf-8") as f:
-            f.write(blob)
+        # Bytes straight to disk, no text-layer re-encode
+        with open(args.output, "wb") as f:
+            f.write(dump_json(payload))
         print(args.output)
     else:
-        print(blob)
+        # Pretty-print for people; compact when piped to another program
+        blob = dump_json(payload, pretty=sys.stdout.isatty())
+        sys.stdout.buffer.write(blob)
+        sys.stdout.buffer.write(b"\n")
 
 
 if __name__ == "__main__":